@@ -1,10 +1,9 @@
 # app/config/settings.py
 
+import os
 import logging
 import uuid
-
-from google.genai import types
-from google.adk.models.google_llm import Gemini
+import functools
 
 
 # 1. Logging Configuration
@@ -13,18 +12,42 @@ logger = logging.getLogger(APP_NAME)
 logger.setLevel(logging.INFO)
 
 # --- ADK/Gemini Configuration ---
+# RETRY_CONFIG and CORE_MODEL are built on first access (module __getattr__ at the bottom), so modules
+# that only need the logger or plain constants don't pay for importing google.genai / google.adk.
+
 # 2. API Retry Configuration
-RETRY_CONFIG = types.HttpRetryOptions(
-    attempts=5,
-    initial_delay=2,
-    http_status_codes=[429, 500, 503, 504],
-    max_delay=2,
-    exp_base=1.5
-)
+# Exponential back-off (0.5s, 1s, 2s, 4s) plus up to 1s of random jitter, capped at 8s.
+# max_delay must stay above initial_delay + jitter, or every wait is clipped to the same value
+# and PRO/CON/Judge calls that hit a 429 together retry together.
+@functools.lru_cache(maxsize=1)
+def _build_retry_config():
+    from google.genai import types
+    return types.HttpRetryOptions(
+        attempts=5,
+        initial_delay=0.5,
+        http_status_codes=[429, 500, 503, 504],
+        max_delay=8,
+        exp_base=2,
+        jitter=1.0
+    )
 
 # 3. Model Definition
 # Core model object using the retry config
-CORE_MODEL = Gemini(model="gemini-2.5-flash", retry_options=RETRY_CONFIG)
+def _build_core_model():
+    from google.adk.models.google_llm import Gemini
+    return Gemini(model="gemini-2.5-flash", retry_options=_build_retry_config())
+
+_LAZY_SETTINGS = {"RETRY_CONFIG": _build_retry_config, "CORE_MODEL": _build_core_model}
+
+# Debate/judge sampling: temperature 0 + a fixed seed, so the same thesis, references and criteria
+# give the same debate (and every turn can be served from the response cache on a rerun)
+DEBATE_TEMPERATURE = float(os.getenv("DEBATE_TEMPERATURE", "0"))
+DEBATE_SEED = int(os.getenv("DEBATE_SEED", "0"))
+
+# Max in-flight Gemini requests per process (429s are retried above, this keeps us from causing them)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+# Max Gemini requests per minute per process (token bucket, 0 disables)
+GEMINI_MAX_RPM = int(os.getenv("GEMINI_MAX_RPM", "60"))
 
 # 4. --- Vertex AI Deployment Constants ---
 REGION ="us-central1"
@@ -37,6 +60,21 @@ EMAIL = "hartk111@gmail.com"
 # 6. Minimum length for thesis input:
 THESIS_MINIMUM_LENGHT = 10
 
+# 7. Opt-in on-disk cache of debate/judge outputs (replays an identical debate without API calls)
+RESPONSE_CACHE_ENABLED = os.getenv("THESIS_ADVISOR_CACHE", "0") == "1"
+RESPONSE_CACHE_DIR = os.getenv("THESIS_ADVISOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "thesis_advisor"))
+# Force refresh: skip cached entries (every call hits the API) but still overwrite them with the fresh output
+RESPONSE_CACHE_REFRESH = os.getenv("THESIS_ADVISOR_CACHE_REFRESH", "0") == "1"
+
 # Probably on real deploy you would have to change it
 USER_ID = "user_1"
-SESSION_ID = f"session_{uuid.uuid4().hex[:6]}"
\ No newline at end of file
+SESSION_ID = f"session_{uuid.uuid4().hex[:6]}"
+
+
+def __getattr__(name):
+    """PEP 562: build RETRY_CONFIG / CORE_MODEL once, on first import or attribute access."""
+    builder = _LAZY_SETTINGS.get(name)
+    if builder is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = builder()
+    return value
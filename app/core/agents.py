@@ -1,31 +1,89 @@
 # ThesisAdvisorAgent/app/core/agents.py
+import asyncio
+import inspect
+import functools
+from typing import Any
 from google.adk.agents import LlmAgent
 from app.config.settings import CORE_MODEL, logger
+from app.function_helpers import response_cache
+from app.function_helpers.references_helpers import dump_json_text, loads_json
+from app.function_helpers.search_helpers import parallel_search
 from google.adk.tools.function_tool import FunctionTool
 from app.infrastructure.tools import GoogleScholarTool, PubMedTool
 
+# Tool clients are stateless between calls: build them once and share them across every wrapper call
+google_scholar_tool = GoogleScholarTool()
+pubmed_tool = PubMedTool(max_results=5)
+
 # --- Tool Wrappers ---
+def to_tool_text(resp: Any) -> str:
+    """Tool results reach the model as text: JSON for structured payloads (fewer tokens than a Python repr)."""
+    return resp if isinstance(resp, str) else dump_json_text(resp)
+
+def is_cacheable_tool_text(text: str) -> bool:
+    """Errors and empty result lists (usually a transient API / rate-limit hiccup) are not worth keeping."""
+    if not text or text.startswith("Error"):
+        return False
+    try:
+        payload = loads_json(text)
+    except ValueError:
+        return True  # plain-text result
+    return not (isinstance(payload, dict) and (payload.get("error") or payload.get("result") == []))
+
+def cached_tool_text(func):
+    """
+    Serve repeated (tool, query) pairs from the opt-in response cache (THESIS_ADVISOR_CACHE=1).
+    Errors and empty results are never stored, so a failed search is retried next time.
+    Works for sync and async tools; the async variant keeps the cache's disk I/O off the event loop.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)  # FunctionTool reads the name, docstring and signature through this
+        async def async_wrapper(query: str) -> str:
+            key = response_cache.make_key(f"tool:{func.__name__}", query)
+            cached = await asyncio.to_thread(response_cache.get_text, key)
+            if cached is not None:
+                return cached
+            text = await func(query)
+            if is_cacheable_tool_text(text):
+                await asyncio.to_thread(response_cache.put_text, key, text)
+            return text
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(query: str) -> str:
+        key = response_cache.make_key(f"tool:{func.__name__}", query)
+        cached = response_cache.get_text(key)
+        if cached is not None:
+            return cached
+        text = func(query)
+        if is_cacheable_tool_text(text):
+            response_cache.put_text(key, text)
+        return text
+    return wrapper
+
+@cached_tool_text
 def google_scholar_execute(query: str) -> str:
     """Search Google Scholar. Returns a readable string of results."""
     # The Logic handles formatting internally in the tool class or here
     # We ensure we return a string to avoid ADK parsing errors
     try:
-        resp = GoogleScholarTool().execute(query)
-        # If it returns a dict, we cast to string so the Agent can read it
-        return str(resp)
+        resp = google_scholar_tool.execute(query)
+        # If it returns a dict, we serialize it to JSON text so the Agent can read it
+        return to_tool_text(resp)
     except Exception as e:
         return f"Error running Google Scholar: {e}"
 
+@cached_tool_text
 def pubmed_execute(query: str) -> str:
     """Search PubMed. If PubMed returns no results or an error, fall back to Google Scholar."""
     try:
-        resp = PubMedTool(max_results=5).execute(query)
+        resp = pubmed_tool.execute(query)
     except Exception as e:
         # PubMed client crashed — try scholar fallback
         logger.warning("[pubmed_execute] PubMed call raised exception, falling back to Google Scholar: %s", e)
         try: # sresp = scholar response
-            sresp = GoogleScholarTool().execute(query)
-            return str(sresp)
+            sresp = google_scholar_tool.execute(query)
+            return to_tool_text(sresp)
         except Exception as e2:
             return f"Error running PubMed and Scholar fallback: {e2}"
 
@@ -34,23 +92,29 @@ def pubmed_execute(query: str) -> str:
         if isinstance(resp, dict):
             if resp.get("error"):
                 logger.info("[pubmed_execute] PubMed returned error, falling back to Google Scholar")
-                sresp = GoogleScholarTool().execute(query)
-                return str(sresp)
+                sresp = google_scholar_tool.execute(query)
+                return to_tool_text(sresp)
             result = resp.get("result", None)
             if isinstance(result, (list, tuple)) and len(result) == 0:
                 logger.info("[pubmed_execute] PubMed returned no results, falling back to Google Scholar")
-                sresp = GoogleScholarTool().execute(query)
-                return str(sresp)
+                sresp = google_scholar_tool.execute(query)
+                return to_tool_text(sresp)
     except Exception as e:
         logger.debug("[pubmed_execute] Unexpected parsing error; attempting Scholar fallback: %s", e)
         try:
-            sresp = GoogleScholarTool().execute(query)
-            return str(sresp)
+            sresp = google_scholar_tool.execute(query)
+            return to_tool_text(sresp)
         except Exception as e2:
             return f"Error running Scholar fallback after PubMed parse error: {e2}"
 
-    # Normal case: return PubMed result as string (agent expects a string)
-    return str(resp)
+    # Normal case: return PubMed result as JSON text (agent expects a string)
+    return to_tool_text(resp)
+
+@cached_tool_text
+async def parallel_search_execute(query: str) -> str:
+    """Search Google Scholar and PubMed at the same time and return the merged results as one string."""
+    # Same {'result': [...]} shape as the single-source tools
+    return to_tool_text(await parallel_search(google_scholar_tool, pubmed_tool, query))
 
 
 # --- Create FunctionTools ---
@@ -62,6 +126,10 @@ _pubmed_fn = FunctionTool(func=pubmed_execute)
 _pubmed_fn.name = "pubmed_execute"
 _pubmed_fn.description = "Useful ONLY for queries about biology, medicine, clinical trials, diseases, or health."
 
+_parallel_fn = FunctionTool(func=parallel_search_execute)
+_parallel_fn.name = "parallel_search_execute"
+_parallel_fn.description = "Searches Google Scholar and PubMed together. Useful for interdisciplinary topics that touch both medicine/biology and another field."
+
 ACADEMIC_TOOLS = [_scholar_fn, _pubmed_fn]
 
 # --- The Talk Agent (Root) ---
@@ -72,20 +140,25 @@ RULES:
 1. Analyze the user's thesis.
 2. Call EXACTLY ONE tool:
    - Call 'pubmed_execute' if the topic is biological/medical.
+   - Call 'parallel_search_execute' if the topic is interdisciplinary (biological/medical AND another field, e.g. AI in radiology).
    - Call 'google_scholar_execute' for everything else.
 3. OUTPUT: Pass the user's query to the tool.
 4. When the tool returns results, forward them EXACTLY as is. Do not summarize. Do not add intro/outro text. Just output the tool result.
 """
 
-DialogAgent1 = LlmAgent(
-    name="DialogAgent1",
-    model=CORE_MODEL,
-    instruction=talk_instruction,
-    tools=ACADEMIC_TOOLS,
-)
+@functools.lru_cache(maxsize=1)
+def get_dialog_agent1() -> LlmAgent:
+    """The single talk/router agent: built on first use (importing this module for the debate tools doesn't), then reused."""
+    return LlmAgent(
+        name="DialogAgent1",
+        model=CORE_MODEL,
+        instruction=talk_instruction,
+        tools=ACADEMIC_TOOLS + [_parallel_fn],
+    )
 
-def get_dialog_agent1():
-    return DialogAgent1
+# Older name, still used by the evaluation and sanity-check scripts
+get_talk_agent = get_dialog_agent1
 
 # - - - Tools For Debaters - - -
+# (one tool per round by the debate rules, so the combined search stays with the talk agent)
 DEBATE_SEARCH_TOOLS = ACADEMIC_TOOLS
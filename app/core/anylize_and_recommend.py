@@ -1,52 +1,99 @@
 # app/core/anylize_and_recommend.py
-import ast
-import json
-import time
+import re
+import random
 import asyncio
-from typing import Any, List, Callable, Dict, Optional
-from app.config.settings import CORE_MODEL, logger
+import hashlib
+import inspect
+import functools
+import contextlib
+from typing import TYPE_CHECKING, Any, Awaitable, List, Callable, Dict, Optional, Sequence, Tuple
+from app.config.settings import CORE_MODEL, DEBATE_SEED, DEBATE_TEMPERATURE, GEMINI_MAX_CONCURRENCY, GEMINI_MAX_RPM, logger
 from google.genai import types as gen_types
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from app.core.agents import DEBATE_SEARCH_TOOLS
-from google.adk.runners import Runner
+from app.function_helpers import response_cache
+from app.function_helpers.rate_limiter import AsyncTokenBucket
+from app.function_helpers.references_helpers import dump_json_text, format_references_for_context, loads_json
+
+if TYPE_CHECKING:  # annotation only; the runner instance is built by the caller
+    from google.adk.runners import Runner
 
 # ---------------------------
 # Robust model call helper(s)
 # ---------------------------
-def call_model(model_obj, model_name, contents):
+# Process-wide cap on in-flight Gemini requests (debate turns, judge, criteria dialog)
+GEMINI_SEMAPHORE = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+# Per-minute request budget; only sleeps once the quota is actually used up
+GEMINI_RATE_LIMITER = AsyncTokenBucket(GEMINI_MAX_RPM, time_period=60)
+
+# Set once an SDK has rejected list-form contents; later calls then go straight to the joined prompt
+# instead of paying a TypeError (and a wasted request attempt) on every turn
+_CONTENTS_AS_TEXT = False
+
+
+def _contents_as_prompt(contents) -> str:
+    """Join the text Parts of list-form contents into one plain prompt (for SDKs that only take a string)."""
+    if not isinstance(contents, (list, tuple)):
+        return str(contents)
+    pieces = []
+    for c in contents:
+        parts = getattr(c, "parts", None) or (c.get("parts") if isinstance(c, dict) else None)
+        if parts:
+            for p in parts:
+                txt = getattr(p, "text", None) or (p.get("text") if isinstance(p, dict) else None)
+                if txt:
+                    pieces.append(str(txt))
+    return "\n\n".join(pieces) if pieces else str(contents)
+
+
+async def call_model(model_obj, model_name, contents, config=None):
     """
-    Try to call generate_content robustly: try with `contents` as-is,
-    but if the SDK expects a string prompt, fall back to str(contents).
+    Try to call generate_content robustly on the SDK's native async client (api_client.aio):
+    try with `contents` as-is, but if the SDK expects a string prompt, fall back to the joined text
+    (and remember that, so the fallback is detected only once per process).
     Returns the model response object or raises the final exception.
+    Every call holds a GEMINI_SEMAPHORE slot and a GEMINI_RATE_LIMITER token, so concurrent debates
+    can't flood the endpoint into 429s.
     """
-    try:
-        return model_obj.api_client.models.generate_content(model=model_name, contents=contents)
-    except TypeError:
-        # Fallback: send joined plain-text prompt if the SDK expects a string
+    global _CONTENTS_AS_TEXT
+    generate = model_obj.api_client.aio.models.generate_content
+    async with GEMINI_RATE_LIMITER, GEMINI_SEMAPHORE:
+        if _CONTENTS_AS_TEXT:
+            return await generate(model=model_name, contents=_contents_as_prompt(contents), config=config)
         try:
-            if isinstance(contents, (list, tuple)):
-                pieces = []
-                for c in contents:
-                    parts = getattr(c, "parts", None) or (c.get("parts") if isinstance(c, dict) else None)
-                    if parts:
-                        for p in parts:
-                            txt = getattr(p, "text", None) or (p.get("text") if isinstance(p, dict) else None)
-                            if txt:
-                                pieces.append(str(txt))
-                fallback_prompt = "\n\n".join(pieces) if pieces else str(contents)
-            else:
-                fallback_prompt = str(contents)
-            return model_obj.api_client.models.generate_content(model=model_name, contents=fallback_prompt)
-        except Exception:
-            # Reraise the original TypeError if fallback failed to make debugging easier
-            raise
+            return await generate(model=model_name, contents=contents, config=config)
+        except TypeError:
+            # Fallback: send joined plain-text prompt if the SDK expects a string
+            resp = await generate(model=model_name, contents=_contents_as_prompt(contents), config=config)
+            _CONTENTS_AS_TEXT = True
+            return resp
+
+async def stream_model_text(model_obj, model_name, contents, config=None, echo: bool = False) -> str:
+    """
+    Stream generate_content on the native async client. With echo=True (console sink only) text chunks
+    are printed to stdout as they arrive (perceived latency = time to first token).
+    Returns the joined text ("" if none came back).
+    """
+    async with GEMINI_RATE_LIMITER, GEMINI_SEMAPHORE:
+        stream = await model_obj.api_client.aio.models.generate_content_stream(model=model_name, contents=contents, config=config)
+        chunks = []
+        async for chunk in stream:
+            txt = getattr(chunk, "text", None)
+            if txt:
+                if echo:
+                    print(txt, end="", flush=True)
+                chunks.append(txt)
+    if chunks and echo:
+        print(flush=True)
+    return "".join(chunks)
 
 def safe_get_text(resp) -> str:
     """
     Return the most-likely human text from a response object:
-    prefer resp.text, then try candidates -> content -> parts -> text, else str(resp).
+    prefer resp.text, then try candidates -> content -> parts -> text, else "".
     """
     txt = getattr(resp, "text", None)
-    if t:
+    if txt:
         return txt
     candidates = getattr(resp, "candidates", None) or (resp.get("candidates") if isinstance(resp, dict) else None)
     if candidates:
@@ -54,12 +101,14 @@ def safe_get_text(resp) -> str:
             content = getattr(cand, "content", None) or (cand.get("content") if isinstance(cand, dict) else None)
             parts = content.get("parts") if isinstance(content, dict) else getattr(content, "parts", None)
             if parts:
-                texts = []
-                for p in parts:
-                    texts.append(getattr(p, "text", None) or (p.get("text") if isinstance(p, dict) else None) or str(p))
-                return "\n".join([str(x) for x in texts if x])
-    # last resort
-    return str(resp)
+                # Every entry is already a str (part text or the part's repr), so join without re-stringifying
+                return "\n".join(
+                    getattr(p, "text", None) or (p.get("text") if isinstance(p, dict) else None) or str(p) for p in parts
+                )
+    # No text (e.g. a safety-blocked prompt): log why instead of materializing the full response repr
+    feedback = getattr(resp, "prompt_feedback", None) or (resp.get("prompt_feedback") if isinstance(resp, dict) else None)
+    logger.warning("[safe_get_text] model returned no text (prompt_feedback=%s)", feedback)
+    return ""
 
 
 # ---------------------------------------------------------------------
@@ -74,6 +123,11 @@ for t in DEBATE_SEARCH_TOOLS:
     if nm and hasattr(t, 'func'):
         TOOL_MAP[nm] = getattr(t, 'func') # FunctionTool
 
+# Name of each tool's single argument (e.g. "query"), read from its signature once at import
+TOOL_ARG_KEY: Dict[str, Optional[str]] = {
+    nm: next(iter(inspect.signature(fn).parameters), None) for nm, fn in TOOL_MAP.items()
+}
+
 
 # ---------------------------------------------------------------------
 # Small helper: inspect model resp object for function_call parts robustly
@@ -83,8 +137,16 @@ def extract_function_call_from_resp(resp: Any) -> Optional[Dict[str, Any]]:
     Try multiple likely locations in the response object to find a function_call part.
     Returns dict: {"name": str, "arguments": dict_or_str} or None if not found.
     """
+    if isinstance(resp, gen_types.GenerateContentResponse):
+        # Fast path for the SDK's typed response (every call_model result): direct attribute access
+        for cand in resp.candidates or ():
+            for part in (cand.content.parts if cand.content else None) or ():
+                fc = part.function_call
+                if fc:
+                    return {"name": fc.name, "arguments": fc.args}
+        return None
     try:
-        candidates = getattr(resp, "candidates", None)
+        candidates = resp.get("candidates") if isinstance(resp, dict) else getattr(resp, "candidates", None)
         if candidates:
             for cand in candidates:
                 content = getattr(cand, "content", None) or (cand.get("content") if isinstance(cand, dict) else None)
@@ -102,17 +164,6 @@ def extract_function_call_from_resp(resp: Any) -> Optional[Dict[str, Any]]:
                                     name = getattr(fc, "name", None)
                                     args = getattr(fc, "args", None) or getattr(fc, "arguments", None)
                                     return {"name": name, "arguments": args}
-        # Fallback: string/repr search (last resort)
-        text_repr = str(resp)
-        if "function_call" in text_repr or '"function_call"' in text_repr:
-            try:
-                start = text_repr.index("{", text_repr.index("function_call"))
-                j = json.loads(text_repr[start:])
-                fc = j.get("function_call") or j.get("functionCall")
-                if fc:
-                    return {"name": fc.get("name"), "arguments": fc.get("args") or fc.get("arguments")}
-            except Exception:
-                pass
         return None
     except Exception as e:
         logger.debug("[extract_function_call_from_resp] unexpected parsing error: %s", e)
@@ -138,12 +189,15 @@ def run_tool_and_get_result(tool_name: str, raw_args: Any) -> Any:
         raw = raw_args.strip()
         try:
             if raw.startswith("{") or raw.startswith("["):
-                args = json.loads(raw)
+                args = loads_json(raw)
         except Exception:
             args = raw_args
 
     try:
         if isinstance(args, dict):
+            key = TOOL_ARG_KEY.get(tool_name)
+            if key in args:
+                return fn(args[key])  # the well-formed call: the model used the declared argument name
             q = args.get("query") or args.get("q") or args.get("text") or args.get("input")
             if q is not None:
                 return fn(q)
@@ -158,9 +212,43 @@ def run_tool_and_get_result(tool_name: str, raw_args: Any) -> Any:
         return {"error": str(e)}
 
 
+# -----------------------
+# Debate sampling
+# -----------------------
+# Shared by the debaters and the Judge: pinned temperature/seed make reruns of the same thesis
+# reproducible (and worth caching). The shared instruction is sent first in every call, so Gemini's
+# implicit prefix caching covers the repeated thesis/references block.
+DEBATE_GENERATE_CONFIG = gen_types.GenerateContentConfig(temperature=DEBATE_TEMPERATURE, seed=DEBATE_SEED)
+
+
 # -----------------------
 # Debate Agent & Judge
 # -----------------------
+@functools.lru_cache(maxsize=2)
+def debate_shared_instruction(thesis_text: str, formatted_references: str, criteria_context: str) -> Tuple[gen_types.Part, str]:
+    """
+    The stance-independent part of the debater instruction, built once per debate and shared by PRO and CON
+    (the same Part object, never mutated), plus its SHA-256 for the response-cache key.
+    """
+    text = (
+        f"Thesis Topic: {thesis_text}\n"
+        f"Evaluation Criteria chosen by user: {criteria_context}\n\n"
+        f"{formatted_references}\n\n"
+        "GENERAL GUIDELINES:\n"
+        "1. Be persuasive based on the criteria chosen.\n"
+        "2. Use specific details from the provided references to support your point.\n"
+        "3. Maintain professional, concise, and logical consistency. **Be highly detailed and elaborate when needed**.\n"
+        "4. **CRITICAL:** You have access to only two **academic search tools: 'google_scholar_execute' and 'pubmed_execute'**. You can use only **ONE** academic tool per round when searching is explicitly permitted.\n"
+        " **Round 1 (Opening):** Use ONLY the references provided above, no search tool use is allowed. If you find any supporting data from reference, say that clearly.\n"
+        " **Rounds 3 and 5 (Strengthening):** You are explicitly permitted to use one academic search tool ('google_scholar_execute' or 'pubmed_execute') to find new research literature to strengthen your case.\n"
+        " **Rounds 2 and 4 (Rebuttal):** Focus on refuting the opponent using existing context; search is discouraged unless absolutely necessary for a counter-claim that requires academic evidence.\n"
+        " Clarification: Somewhat ambiguous in thesis isn't a claim,"
+        " assume user can use method available to humanity and has the capabilities,"
+        " focus on thesis idea and potential, not on the \"not good enough\" wording or not elaborate research method.\n\n"
+    )
+    return gen_types.Part.from_text(text=text), hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 class ContextAwareDebateAgent:
     def __init__(
         self,
@@ -175,58 +263,68 @@ class ContextAwareDebateAgent:
         self.name = name
         self.stance = stance.upper()  # "PRO" or "CON"
 
-        self.base_instruction = (
-            f"You are {name}. Stance: {self.stance}. Your goal is to be highly persuasive.\n"
-            f"Thesis Topic: {thesis_text}\n"
-            f"Evaluation Criteria chosen by user: {criteria_context}\n\n"
-            f"{formatted_references}\n\n"
-            "GENERAL GUIDELINES:\n"
-            "1. Be persuasive based on the criteria chosen.\n"
-            "2. Use specific details from the provided references to support your point.\n"
-            "3. Maintain professional, concise, and logical consistency. **Be highly detailed and elaborate when needed**.\n"
-            "4. **CRITICAL:** You have access to only two **academic search tools: 'google_scholar_execute' and 'pubmed_execute'**. You can use only **ONE** academic tool per round when searching is explicitly permitted.\n"
-            " **Round 1 (Opening):** Use ONLY the references provided above, no search tool use is allowed. If you find any supporting data from reference, say that clearly.\n"
-            " **Rounds 3 and 5 (Strengthening):** You are explicitly permitted to use one academic search tool ('google_scholar_execute' or 'pubmed_execute') to find new research literature to strengthen your case.\n"
-            " **Rounds 2 and 4 (Rebuttal):** Focus on refuting the opponent using existing context; search is discouraged unless absolutely necessary for a counter-claim that requires academic evidence.\n"
-            " Clarification: Somewhat ambiguous in thesis isn't a claim,"
-            " assume user can use method available to humanity and has the capabilities,"
-            " focus on thesis idea and potential, not on the \"not good enough\" wording or not elaborate research method."
-        )
+        self.generate_config = DEBATE_GENERATE_CONFIG
+
+        # The shared block (thesis, criteria, references, rules) is one Part object used by both PRO and
+        # CON, and it is sent first so both send an identical prefix (Gemini's implicit prefix caching).
+        # Only the short role line is per agent.
+        self._shared_part, shared_digest = debate_shared_instruction(thesis_text, formatted_references, criteria_context)
+        self.role_instruction = f"YOUR ROLE: You are {name}. Stance: {self.stance}. Your goal is to be highly persuasive."
+
+        # Built once: every round reuses the same Parts and the instruction is hashed only here
+        self._role_part = gen_types.Part.from_text(text=self.role_instruction)
+        self.instruction_digest = hashlib.sha256(f"{shared_digest}:{self.role_instruction}".encode("utf-8")).hexdigest()
 
         self.model = CORE_MODEL
+        self._model_name = getattr(self.model, "model", "gemini-2.5-flash")
         self.tools = tools
 
-        # Keep only base + last response to limit context growth
-        self.history: List[str] = [self.base_instruction]
+        # Only the agent's own last response is carried into the next round, to limit context growth
+        self.last_response: str = ""
 
-    def _build_call_contents(self, last_response: str, context_prompt: str) -> List[gen_types.Content]:
-        """Build the genai contents list: system (base instruction) + user (last + current)"""
-        history_text = last_response if last_response else "No previous response."
-        user_text = (
-            f"{self.base_instruction}\n\n"
-            f"PREVIOUS (last) RESPONSE:\n{history_text}\n\n"
-            f"CURRENT INSTRUCTION:\n{context_prompt}"
-        )
+    def _build_call_contents(
+        self, last_response: str, context_prompt: str, extra_parts: Sequence[gen_types.Part] = ()
+    ) -> List[gen_types.Content]:
+        """
+        Build the genai contents as a short chat: user (base instruction) -> model (own last response)
+        -> user (current instruction + extra_parts). Only the new instruction changes between rounds;
+        the base instruction Parts are shared and nothing already sent is re-joined into a new string.
+        """
+        current_parts = [gen_types.Part.from_text(text=f"CURRENT INSTRUCTION:\n{context_prompt}"), *extra_parts]
+        if not last_response:
+            return [gen_types.Content(role="user", parts=[self._shared_part, self._role_part, *current_parts])]
         return [
-            gen_types.Content(role="user", parts=[gen_types.Part.from_text(text=user_text)])
+            gen_types.Content(role="user", parts=[self._shared_part, self._role_part]),
+            gen_types.Content(role="model", parts=[gen_types.Part.from_text(text=last_response)]),
+            gen_types.Content(role="user", parts=current_parts),
         ]
 
-    def argue(self, context_prompt: str) -> str:
+    async def argue(self, context_prompt: str) -> str:
         """
         Generates an argument. This function:
-        - Sends base + last response + current instruction to the model
+        - Sends base instruction, its own last response (as the model turn) and the current instruction
         - If the model returns a function_call, the host runs the tool and re-invokes
           the model including the tool result so the model can incorporate it.
         - Returns the final model text output.
         """
-        last_response = self.history[1] if len(self.history) > 1 else ""
+        last_response = self.last_response
 
         contents = self._build_call_contents(last_response, context_prompt)
 
-        model_name = getattr(self.model, "model", "gemini-2.5-flash")
+        model_name = self._model_name
+
+        # Same request shape as `contents`, but the base instruction goes in as its precomputed digest
+        cache_key = response_cache.make_key(
+            model_name, DEBATE_TEMPERATURE, DEBATE_SEED,
+            self.instruction_digest, last_response, context_prompt
+        )
+        cached_text = await asyncio.to_thread(response_cache.get_text, cache_key)
+        if cached_text is not None:
+            self.last_response = cached_text
+            return cached_text
 
         # 1) initial call
-        resp = call_model(self.model, model_name, contents)
+        resp = await call_model(self.model, model_name, contents, self.generate_config)
 
         # 2) inspect for function_call
         fc = extract_function_call_from_resp(resp)
@@ -235,37 +333,40 @@ class ContextAwareDebateAgent:
             raw_args = fc.get("arguments")
             logger.info("[argue] model requested tool '%s' with args: %s", tool_name, raw_args)
 
-            # run the tool on host
-            tool_result = run_tool_and_get_result(tool_name, raw_args)
+            # run the tool on host (blocking HTTP client, so keep it off the event loop)
+            tool_result = await asyncio.to_thread(run_tool_and_get_result, tool_name, raw_args)
 
             # Format tool result as a deterministic text block to send back to model
             try:
-                tool_result_text = json.dumps(tool_result) if not isinstance(tool_result, str) else str(tool_result)
+                tool_result_text = dump_json_text(tool_result) if not isinstance(tool_result, str) else tool_result
             except Exception:
                 tool_result_text = str(tool_result)
 
             # 3) Re-call the model including the tool result as additional user info
             tool_feedback = f"[TOOL_RESPONSE: {tool_name}]\n{tool_result_text}\n[/TOOL_RESPONSE]\nNow, using the above tool output, produce your argument for this round."
 
-            # Combine current instruction and tool feedback into one prompt for the agent
-            updated_context_prompt = f"{context_prompt}\n\n{tool_feedback}"
+            # Tool feedback rides along as its own Part after the current instruction
+            new_contents = self._build_call_contents(
+                last_response, context_prompt, [gen_types.Part.from_text(text=tool_feedback)]
+            )
 
-            # **REUSE the corrected builder, passing the new prompt**
-            new_contents = self._build_call_contents(last_response, updated_context_prompt)
-
-            resp2 = call_model(self.model, model_name, new_contents)
+            resp2 = await call_model(self.model, model_name, new_contents, self.generate_config)
             final_text = safe_get_text(resp2)
         else:
             final_text = safe_get_text(resp)
 
         # Save only the last output to keep history small for the next round
-        self.history = [self.base_instruction, final_text]
+        self.last_response = final_text
+        await asyncio.to_thread(response_cache.put_text, cache_key, final_text)
         return final_text
 
 
 class ContextAwareJudge:
     def __init__(self, thesis_text: str, formatted_references: str, criteria_context: str):
         self.model = CORE_MODEL
+        self._model_name = getattr(self.model, "model", "gemini-2.5-flash")
+
+        self.generate_config = DEBATE_GENERATE_CONFIG
 
         self.instruction = (
             f"You are a neutral, rigorous Judge helping a user improve their thesis. **Be highly detailed in your feedback**.\n"
@@ -301,197 +402,334 @@ class ContextAwareJudge:
             "FEEDBACK FOR USER:\n"
             "Provide 3 actionable steps to improve the thesis based on the CON arguments that won points. **Elaborate on the weaknesses and provide concrete solutions.**"
         )
+        # Instruction and transcript go out as separate Parts, so the (large) transcript is never
+        # copied into one combined prompt string; the instruction Part and digest are built once
+        self._instruction_part = gen_types.Part.from_text(text=self.instruction)
+        self._transcript_header_part = gen_types.Part.from_text(text="TRANSCRIPT OF DEBATE:")
+        self.instruction_digest = hashlib.sha256(self.instruction.encode("utf-8")).hexdigest()
 
-    def judge(self, transcript: str) -> str:
+    async def judge(self, transcript: str, echo: bool = False) -> str:
         """
         Judge should receive the full transcript for final evaluation.
+        With echo=True the verdict is streamed to stdout while it is generated; the full text is returned.
         """
-        model_name = getattr(self.model, "model", "gemini-2.5-flash")
-        prompt = f"{self.instruction}\n\nTRANSCRIPT OF DEBATE:\n{transcript}"
+        model_name = self._model_name
+        contents = [gen_types.Content(role="user", parts=[
+            self._instruction_part,
+            self._transcript_header_part,
+            gen_types.Part.from_text(text=transcript),
+        ])]
+
+        cache_key = response_cache.make_key(
+            model_name, DEBATE_TEMPERATURE, DEBATE_SEED, self.instruction_digest, transcript
+        )
+        cached_verdict = await asyncio.to_thread(response_cache.get_text, cache_key)
+        if cached_verdict is not None:
+            if echo:
+                print(cached_verdict, flush=True)
+            return cached_verdict
 
         max_retries = 3
         for attempt in range(max_retries):
-            resp = call_model(self.model, model_name, prompt)
-            if resp is not None:
-                return safe_get_text(resp)
+            verdict = await stream_model_text(self.model, model_name, contents, self.generate_config, echo=echo)
+            if verdict:
+                await asyncio.to_thread(response_cache.put_text, cache_key, verdict)
+                return verdict
+
+            if attempt + 1 == max_retries:
+                break  # no point sleeping before giving up
+            # Exponential backoff with jitter (2s, 4s, ... plus up to 0.5s), so retries don't fire in lockstep
+            delay = 2 * 2 ** attempt + random.uniform(0, 0.5)
+            logger.warning(
+                "[judge] API call returned no text, retrying in %.1f seconds (attempt %d/%d)", delay, attempt + 1, max_retries
+            )
+            await asyncio.sleep(delay)
+
+        raise RuntimeError(f"Failed to get a non-empty response from the model after {max_retries} attempts.")
+
 
-            print(f"API call failed (returned None), retrying in 2 seconds (Attempt {attempt + 1}/{max_retries})...")
-            time.sleep(2)
+# -----------------------
+# Verdict score parsing
+# -----------------------
+# Matches the judge's strict SCORES block, e.g. "Round 3: PRO=7, CON=6" / "TOTAL: PRO=38, CON=31"
+_ROUND_SCORE_RE = re.compile(r"Round\s+(\d+)\W*:\W*PRO\s*=\s*(\d+)\s*,\s*CON\s*=\s*(\d+)", re.IGNORECASE)
+_TOTAL_SCORE_RE = re.compile(r"TOTAL\W*:\W*PRO\s*=\s*(\d+)\s*,\s*CON\s*=\s*(\d+)", re.IGNORECASE)
 
-        raise RuntimeError(f"Failed to get a non-None response from the model after {max_retries} attempts.")
+
+def parse_verdict_scores(verdict: str) -> Optional[Dict[str, Any]]:
+    """
+    Pull the per-round scores out of the verdict text and sum them locally (no extra model call).
+    Returns {"rounds": {n: (pro, con)}, "pro": int, "con": int, "reported": (pro, con) | None},
+    or None when the verdict has no parsable SCORES block. A repeated round keeps its first score.
+    """
+    rounds: Dict[int, tuple] = {}
+    for m in _ROUND_SCORE_RE.finditer(verdict):
+        rounds.setdefault(int(m[1]), (int(m[2]), int(m[3])))
+    if not rounds:
+        return None
+    total = _TOTAL_SCORE_RE.search(verdict)
+    return {
+        "rounds": rounds,
+        "pro": sum(p for p, _ in rounds.values()),
+        "con": sum(c for _, c in rounds.values()),
+        "reported": (int(total[1]), int(total[2])) if total else None,
+    }
 
 
 # -----------------------
 # Main Process: execute_debate_process
 # -----------------------
+# Static criteria-dialog prompt; only the thesis and references are filled in per debate
+CRITERIA_DIALOG_PROMPT = (
+    "User Thesis: '{thesis_text}'\n"
+    "References Summary: {references}...\n\n"
+    "Task: Ask the user to choose exactly 3 criteria from this list:\n"
+    "1. Scope and Fit\n2. Academic Relevance/Novelty\n3. Research Feasibility\n"
+    "4. Ethical Considerations\n5. Possible Methodology\n6. Professional/Future Relevance\n"
+    "7. Personal Interest/Motivation\n\n"
+    "After they choose 3, ask if they want to add ONE custom criterion.\n"
+    "When finalized, output EXACTLY: 'CRITERIA_FINALIZED: [comma separated list]'"
+)
+CRITERIA_SENTINEL = "CRITERIA_FINALIZED:"
+
+# Round prompts, built once at import; rounds 2-4 fill in the opponent's previous speech with .format()
+ROUND1_PROMPT = (
+    "ROUND 1: State clearly why this thesis is good/bad based on the criteria."
+    "Do not address opponent yet. **You MUST ONLY use the references provided in your context.**"
+    "Cite at least one of the provided articles (e.g., 'According to Article \"title\", ...'), "
+    "It should be readable, not in json format."
+    "Tool use is strictly forbidden in this round."
+)
+ROUND2_PROMPT = "ROUND 2: **Refute the opponent's R1 claim ONLY.** The opponent's R1 claim was: '{}'"
+ROUND3_PROMPT = "ROUND 3: **Refute the opponent's R2 claim, and strengthen your case.** You can search for **new research literature** using the academic tool to support your case. The opponent's R2 claim was: '{}'"
+ROUND4_PROMPT = "ROUND 4: **Refute the opponent's R3 claim, and strengthen your case.** The opponent's R3 claim was: '{}'"
+# Focused on academic evidence/summary (no mention of web/statistics)
+ROUND5_PROMPT = "ROUND 5 (FINAL): Ignore the opponent now. Make your final, strongest case for why you are right based on the criteria. You can search for final supporting academic evidence (scholar or pubmed) if needed. Summarize your best points. **Be highly detailed and elaborate**."
+
+
+async def console_input(prompt: str) -> str:
+    """Default get_user_input: input() blocks, so wait for the user off the event loop."""
+    return await asyncio.to_thread(input, prompt)
+
+
+async def console_output(message: str) -> None:
+    """Default on_agent_message: print to the terminal."""
+    print(message, flush=True)
+
+
+async def argue_round(pro, pro_prompt: str, con, con_prompt: str) -> Tuple[str, str]:
+    """
+    Run one round's PRO and CON turns at once. If either fails, the other is cancelled (so no model call
+    is left running for a debate that is already lost) and the error propagates unchanged.
+    """
+    tasks = [asyncio.ensure_future(pro.argue(pro_prompt)), asyncio.ensure_future(con.argue(con_prompt))]
+    try:
+        pro_text, con_text = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return pro_text, con_text
+
+
+def criteria_line_complete(text: str) -> bool:
+    """True once the sentinel and a newline-terminated criteria list after it have arrived."""
+    _, found, tail = text.partition(CRITERIA_SENTINEL)
+    if not found:
+        return False
+    line, newline, _ = tail.lstrip().partition("\n")
+    return bool(newline and line.strip())
+
 async def execute_debate_process(
     thesis_text: str,
     references_json: Any,
-    runner: Runner, # Explicitly typed Runner now
+    runner: "Runner", # Explicitly typed Runner now
     user_id: str,
     session_id: str,
-    *,
-    blocking_mode: str = "to_thread"
+    get_user_input: Callable[[str], Awaitable[str]] = console_input,
+    on_agent_message: Callable[[str], Awaitable[None]] = console_output,
 ):
     """
     Orchestrates:
     1) Criteria dialog (via runner)
     2) 5-round debate between two ContextAwareDebateAgent instances
     3) Final judgment using ContextAwareJudge (gets whole transcript)
+    All user I/O goes through get_user_input / on_agent_message (console by default), so the
+    process can be driven from a web server or UI without blocking the event loop.
     """
+    formatted_refs = format_references_for_context(references_json, query=thesis_text)
 
     # --- 1. Dialog Phase (Criteria Selection) ---
+    # SSE: the runner yields partial text events as tokens arrive, then one aggregated final event
+    dialog_run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+    streaming_to_console = on_agent_message is console_output
+
     async def run_criteria_dialog() -> str:
-        initial_msg = (
-            f"User Thesis: '{thesis_text}'\n"
-            f"References Summary: {references_json}...\n\n"
-            "Task: Ask the user to choose exactly 3 criteria from this list:\n"
-            "1. Scope and Fit\n2. Academic Relevance/Novelty\n3. Research Feasibility\n"
-            "4. Ethical Considerations\n5. Possible Methodology\n6. Professional/Future Relevance\n"
-            "7. Personal Interest/Motivation\n\n"
-            "After they choose 3, ask if they want to add ONE custom criterion.\n"
-            "When finalized, output EXACTLY: 'CRITERIA_FINALIZED: [comma separated list]'"
-        )
+        initial_msg = CRITERIA_DIALOG_PROMPT.format(thesis_text=thesis_text, references=formatted_refs)
 
         current_input = initial_msg
 
         while True:
             content = gen_types.Content(role="user", parts=[gen_types.Part.from_text(text=current_input)])
-            response_stream = runner.run_async(user_id=user_id, session_id=session_id, new_message=content)
-
-            agent_text = ""
-            async for event in response_stream:
-                if event.content and event.content.parts:
+            response_stream = runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=content, run_config=dialog_run_config
+            )
+
+            chunks: List[str] = []
+            saw_partial = False
+            # Sentinel search only looks at the new text plus a carry-over tail (it may straddle two chunks);
+            # the buffer is joined for the full line check only once the sentinel has arrived
+            sentinel_seen = False
+            carry = ""
+            if streaming_to_console:
+                print("🤖 **Agent:** ", end="", flush=True)
+            # aclosing: leaving the loop early closes the runner's generator and stops generation
+            async with GEMINI_RATE_LIMITER, GEMINI_SEMAPHORE, contextlib.aclosing(response_stream):
+                async for event in response_stream:
+                    if not (event.content and event.content.parts):
+                        continue
+                    partial = bool(getattr(event, "partial", False))
+                    if not partial and saw_partial:
+                        continue  # the aggregated final event repeats text already taken from the partials
+                    saw_partial = saw_partial or partial
                     for part in event.content.parts:
                         if getattr(part, "text", None):
-                            agent_text += part.text
-
-            if not agent_text:
-                agent_text = "..."
-
-            print(f"🤖 **Agent:** {agent_text}")
+                            chunks.append(part.text)
+                            if streaming_to_console:
+                                print(part.text, end="", flush=True)
+                            if not sentinel_seen:
+                                window = carry + part.text
+                                sentinel_seen = CRITERIA_SENTINEL in window
+                                carry = window[-(len(CRITERIA_SENTINEL) - 1):]
+                    if sentinel_seen and criteria_line_complete("".join(chunks)):
+                        break  # everything after the criteria line is wasted output
+
+            agent_text = "".join(chunks) or "..."
+
+            if streaming_to_console:
+                if not agent_text.endswith("\n"):
+                    print(flush=True)
+            else:
+                await on_agent_message(f"🤖 **Agent:** {agent_text}")
 
-            if "CRITERIA_FINALIZED:" in agent_text:
-                extracted_criteria = agent_text.split("CRITERIA_FINALIZED:", 1)[1].strip()
-                return extracted_criteria
+            # Single scan: partition finds the sentinel and hands back the criteria tail
+            _, found, extracted_criteria = agent_text.partition(CRITERIA_SENTINEL)
+            if found:
+                return extracted_criteria.strip().partition("\n")[0].strip()
 
-            user_response = input("👤 **You:** ").strip()
+            user_response = (await get_user_input("👤 **You:** ")).strip()
             current_input = user_response
 
-    print("\n--- 🎯 Criteria Selection Phase ---")
+    await on_agent_message("\n--- 🎯 Criteria Selection Phase ---")
     criteria = await run_criteria_dialog()
-    print(f"\n✅ Criteria Selected: {criteria}")
+    await on_agent_message(f"\n✅ Criteria Selected: {criteria}")
 
     # --- 2. Debate Phase ---
     # Agent initialization uses the cleaned signature
-    con = ContextAwareDebateAgent("Agent CON", "con", thesis_text, references_json, criteria, tools=DEBATE_SEARCH_TOOLS)
-    pro = ContextAwareDebateAgent("Agent PRO", "pro", thesis_text, references_json, criteria, tools=DEBATE_SEARCH_TOOLS)
+    con = ContextAwareDebateAgent("Agent CON", "con", thesis_text, formatted_refs, criteria, tools=DEBATE_SEARCH_TOOLS)
+    pro = ContextAwareDebateAgent("Agent PRO", "pro", thesis_text, formatted_refs, criteria, tools=DEBATE_SEARCH_TOOLS)
 
-    transcript_lines = [
-        f"THESIS: {thesis_text}",
-        f"CRITERIA: {criteria}"
-    ]
-
-    async def run_agent(agent_obj, prompt_text):
-        if blocking_mode == "to_thread":
-            return await asyncio.to_thread(agent_obj.argue, prompt_text)
-        else:
-            return agent_obj.argue(prompt_text)
+    # Transcript as labels + references to the speech strings; the judge's text is built by one join at
+    # the end, instead of copying every speech into a labelled line first
+    transcript_parts: List[str] = ["THESIS: ", thesis_text, "\nCRITERIA: ", criteria]
 
     last_con_speech = ""
     last_pro_speech = ""
 
     # ROUND 1
-    print("\n--- Round 1: Opening Statements ---")
-    r1_prompt = ("ROUND 1: State clearly why this thesis is good/bad based on the criteria."
-             "Do not address opponent yet. **You MUST ONLY use the references provided in your context.**"
-             "Cite at least one of the provided articles (e.g., 'According to Article \"title\", ...'), "
-                 "It should be readable, not in json format."
-             "Tool use is strictly forbidden in this round.")
-    print("🔵 PRO (R1) Opening:")
-    pro_r1 = await run_agent(pro, r1_prompt)
-    print(pro_r1)
-    transcript_lines.append(f"ROUND 1 PRO: {pro_r1}")
+    await on_agent_message("\n--- Round 1: Opening Statements ---")
+    # Openings don't see each other, so both run at once
+    pro_r1, con_r1 = await argue_round(pro, ROUND1_PROMPT, con, ROUND1_PROMPT)
+
+    await on_agent_message("🔵 PRO (R1) Opening:")
+    await on_agent_message(pro_r1)
+    transcript_parts += ("\nROUND 1 PRO: ", pro_r1)
     last_pro_speech = pro_r1
 
-    print("\n🔴 CON (R1) Opening:")
-    con_r1 = await run_agent(con, r1_prompt)
-    print(con_r1)
-    transcript_lines.append(f"ROUND 1 CON: {con_r1}")
+    await on_agent_message("\n🔴 CON (R1) Opening:")
+    await on_agent_message(con_r1)
+    transcript_parts += ("\nROUND 1 CON: ", con_r1)
     last_con_speech = con_r1
 
+    # ROUNDS 2-4: each side rebuts the opponent's speech from the PREVIOUS round (as the prompts say),
+    # so PRO and CON of the same round are independent and run at once
     # ROUND 2
-    print("\n--- Round 2: Refute First Arguments (R1 Only) ---")
-    print("🔵 PRO (R2) Rebuttal:")
-    pro_r2_prompt = f"ROUND 2: **Refute the opponent's R1 claim ONLY.** The opponent's R1 claim was: '{last_con_speech}'"
-    pro_r2 = await run_agent(pro, pro_r2_prompt)
-    print(pro_r2)
-    transcript_lines.append(f"ROUND 2 PRO: {pro_r2}")
-    last_pro_speech = pro_r2
-
-    print("\n🔴 CON (R2) Rebuttal:")
-    con_r2_prompt = f"ROUND 2: **Refute the opponent's R1 claim ONLY.** The opponent's R1 claim was: '{last_pro_speech}'"
-    con_r2 = await run_agent(con, con_r2_prompt)
-    print(con_r2)
-    transcript_lines.append(f"ROUND 2 CON: {con_r2}")
-    last_con_speech = con_r2
+    await on_agent_message("\n--- Round 2: Refute First Arguments (R1 Only) ---")
+    pro_r2, con_r2 = await argue_round(
+        pro, ROUND2_PROMPT.format(last_con_speech),
+        con, ROUND2_PROMPT.format(last_pro_speech),
+    )
+
+    await on_agent_message("🔵 PRO (R2) Rebuttal:")
+    await on_agent_message(pro_r2)
+    transcript_parts += ("\nROUND 2 PRO: ", pro_r2)
+
+    await on_agent_message("\n🔴 CON (R2) Rebuttal:")
+    await on_agent_message(con_r2)
+    transcript_parts += ("\nROUND 2 CON: ", con_r2)
+    last_pro_speech, last_con_speech = pro_r2, con_r2
 
     # ROUND 3
-    print("\n--- Round 3: Deepening the Argument (Refute R1 & R2) ---")
-    print("🔵 PRO (R3) Rebuttal and Strengthen:")
-    pro_r3_prompt = f"ROUND 3: **Refute the opponent's R2 claim, and strengthen your case.** You can search for **new research literature** using the academic tool to support your case. The opponent's R2 claim was: '{last_con_speech}'"
-    pro_r3 = await run_agent(pro, pro_r3_prompt)
-    print(pro_r3)
-    transcript_lines.append(f"ROUND 3 PRO: {pro_r3}")
-    last_pro_speech = pro_r3
-
-    print("\n🔴 CON (R3) Rebuttal and Strengthen:")
-    con_r3_prompt = f"ROUND 3: **Refute the opponent's R2 claim, and strengthen your case.** You can search for **new research literature** using the academic tool to support your case. The opponent's R2 claim was: '{last_pro_speech}'"
-    con_r3 = await run_agent(con, con_r3_prompt)
-    print(con_r3)
-    transcript_lines.append(f"ROUND 3 CON: {con_r3}")
-    last_con_speech = con_r3
+    await on_agent_message("\n--- Round 3: Deepening the Argument (Refute R1 & R2) ---")
+    pro_r3, con_r3 = await argue_round(
+        pro, ROUND3_PROMPT.format(last_con_speech),
+        con, ROUND3_PROMPT.format(last_pro_speech),
+    )
+
+    await on_agent_message("🔵 PRO (R3) Rebuttal and Strengthen:")
+    await on_agent_message(pro_r3)
+    transcript_parts += ("\nROUND 3 PRO: ", pro_r3)
+
+    await on_agent_message("\n🔴 CON (R3) Rebuttal and Strengthen:")
+    await on_agent_message(con_r3)
+    transcript_parts += ("\nROUND 3 CON: ", con_r3)
+    last_pro_speech, last_con_speech = pro_r3, con_r3
 
     # ROUND 4
-    print("\n--- Round 4: Complex Rebuttal (Refute R1, R2, R3) ---")
-    print("🔵 PRO (R4) Rebuttal and Strengthen:")
-    pro_r4_prompt = f"ROUND 4: **Refute the opponent's R3 claim, and strengthen your case.** The opponent's R3 claim was: '{last_con_speech}'"
-    pro_r4 = await run_agent(pro, pro_r4_prompt)
-    print(pro_r4)
-    transcript_lines.append(f"ROUND 4 PRO: {pro_r4}")
-    last_pro_speech = pro_r4
-
-    print("\n🔴 CON (R4) Rebuttal and Strengthen:")
-    con_r4_prompt = f"ROUND 4: **Refute the opponent's R3 claim, and strengthen your case.** The opponent's R3 claim was: '{last_pro_speech}'"
-    con_r4 = await run_agent(con, con_r4_prompt)
-    print(con_r4)
-    transcript_lines.append(f"ROUND 4 CON: {con_r4}")
-    last_con_speech = con_r4
+    await on_agent_message("\n--- Round 4: Complex Rebuttal (Refute R1, R2, R3) ---")
+    pro_r4, con_r4 = await argue_round(
+        pro, ROUND4_PROMPT.format(last_con_speech),
+        con, ROUND4_PROMPT.format(last_pro_speech),
+    )
+
+    await on_agent_message("🔵 PRO (R4) Rebuttal and Strengthen:")
+    await on_agent_message(pro_r4)
+    transcript_parts += ("\nROUND 4 PRO: ", pro_r4)
+
+    await on_agent_message("\n🔴 CON (R4) Rebuttal and Strengthen:")
+    await on_agent_message(con_r4)
+    transcript_parts += ("\nROUND 4 CON: ", con_r4)
 
     # ROUND 5
-    print("\n--- Round 5: Closing Statements (Final Strengthening) ---")
-    # Updated prompt to focus on academic/summary, removing mention of web/statistics
-    r5_prompt = "ROUND 5 (FINAL): Ignore the opponent now. Make your final, strongest case for why you are right based on the criteria. You can search for final supporting academic evidence (scholar or pubmed) if needed. Summarize your best points. **Be highly detailed and elaborate**."
-    print("🔵 PRO (R5) Final Statement:")
-    pro_r5 = await run_agent(pro, r5_prompt)
-    print(pro_r5)
-    transcript_lines.append(f"ROUND 5 PRO: {pro_r5}")
-
-    print("\n🔴 CON (R5) Final Statement:")
-    con_r5 = await run_agent(con, r5_prompt)
-    print(con_r5)
-    transcript_lines.append(f"ROUND 5 CON: {con_r5}")
+    await on_agent_message("\n--- Round 5: Closing Statements (Final Strengthening) ---")
+    # Closings ignore the opponent, so both run at once
+    pro_r5, con_r5 = await argue_round(pro, ROUND5_PROMPT, con, ROUND5_PROMPT)
 
-    # --- 3. Judging Phase ---
-    print("\n⚖️  Judge is deliberating...")
-    full_transcript = "\n".join(transcript_lines)
+    await on_agent_message("🔵 PRO (R5) Final Statement:")
+    await on_agent_message(pro_r5)
+    transcript_parts += ("\nROUND 5 PRO: ", pro_r5)
 
-    judge = ContextAwareJudge(thesis_text, references_json, criteria)
-    if blocking_mode == "to_thread":
-        verdict = await asyncio.to_thread(judge.judge, full_transcript)
-    else:
-        verdict = judge.judge(full_transcript)
+    await on_agent_message("\n🔴 CON (R5) Final Statement:")
+    await on_agent_message(con_r5)
+    transcript_parts += ("\nROUND 5 CON: ", con_r5)
 
-    print("\n🏆 **FINAL VERDICT:**")
-    print(verdict)
+    # --- 3. Judging Phase ---
+    await on_agent_message("\n⚖️  Judge is deliberating...")
+    full_transcript = "".join(transcript_parts)
+
+    judge = ContextAwareJudge(thesis_text, formatted_refs, criteria)
+    await on_agent_message("\n🏆 **FINAL VERDICT:**")
+    # Console: streamed as it arrives; any other sink gets the verdict as one message
+    verdict = await judge.judge(full_transcript, echo=streaming_to_console)
+    if not streaming_to_console:
+        await on_agent_message(verdict)
+
+    # The model's own TOTAL line is arithmetic it can get wrong (or leave out); re-add the round scores here
+    scores = parse_verdict_scores(verdict)
+    if scores and scores["reported"] is None:
+        logger.info("[execute_debate_process] judge gave no TOTAL line; summed the rounds: %s", (scores["pro"], scores["con"]))
+        await on_agent_message(f"\n📊 Totals computed from the round scores: PRO={scores['pro']}, CON={scores['con']}")
+    elif scores and scores["reported"] != (scores["pro"], scores["con"]):
+        logger.info("[execute_debate_process] judge TOTAL %s != sum of rounds %s", scores["reported"], (scores["pro"], scores["con"]))
+        await on_agent_message(f"\n📊 Recomputed totals from the round scores: PRO={scores['pro']}, CON={scores['con']}")
     return verdict
\ No newline at end of file
@@ -1,10 +1,10 @@
 # cloud_helpers
 import re
-import ast
 import json
-from typing import Any, Optional, List, Dict
+from typing import Any, Callable, Optional, List, Dict
 from app.infrastructure.tools import GoogleScholarTool, PubMedTool
 from app.config.settings import logger
+from app.function_helpers.references_helpers import parse_structured_text
 
 # Instantiate your tools once if possible, or inside the function if needed
 # Instantiating here is usually cleaner for simple clients:
@@ -13,12 +13,16 @@ pubmed_tool = PubMedTool()
 # -----------------------
 # Parsing & Pretty helpers
 # -----------------------
+# First {...} or [...] block in a string (greedy-ish but ok for our outputs)
+_OBJECT_RE = re.compile(r'(\{.*}|\[.*])', re.DOTALL)
+
 def safe_parse_string(s: Any) -> Any:
     """
     Try to turn `s` (string/bytes) into Python object:
-    1) json.loads
+    1) json.loads (orjson when installed, quote-swapped repr next)
     2) ast.literal_eval
-    3) find first {...} or [...] substring and attempt parsing again
+    (1 and 2 via references_helpers.parse_structured_text)
+    3) find first {...} or [...] substring and attempt parsing again (same parsers)
     If all fail, return cleaned string.
     """
     if s is None:
@@ -42,38 +46,33 @@ def safe_parse_string(s: Any) -> Any:
     if not s_strip:
         return s_strip
 
-    # try JSON first
-    try:
-        return json.loads(s_strip)
-    except Exception:
-        pass
+    # JSON (orjson when installed), then quote-swapped repr, then ast.literal_eval;
+    # the very same object comes back only when none of them parsed
+    parsed = parse_structured_text(s_strip)
+    if parsed is not s_strip:
+        return parsed
 
-    # try python-literal (single quotes)
-    try:
-        return ast.literal_eval(s_strip)
-    except Exception:
-        pass
+    # Wrapped in a matching {...} / [...] pair: the greedy regex would match the whole string, which failed above
+    if s_strip[0] + s_strip[-1] in ("{}", "[]"):
+        return s_strip
 
     # try to locate first balanced {...} or [...] block and parse that
     # This helps if I get outer quoting like: "{'result': [...]}"
-
-    # regex to find first { ... } or [ ... ] pair (greedy-ish but ok for our outputs)
-    match = re.search(r'(\{.*}|\[.*])', s_strip, flags=re.DOTALL)
+    match = _OBJECT_RE.search(s_strip)
     if match:
         candidate = match.group(0)
-        # try json then literal eval
-        try:
-            return json.loads(candidate)
-        except Exception:
-            try:
-                return ast.literal_eval(candidate)
-            except Exception:
-                pass
+        parsed = parse_structured_text(candidate)
+        if parsed is not candidate:
+            return parsed
 
     # nothing parsed — return original trimmed string
     return s_strip
 
 
+# Values normalize_tool_output may still have to unwrap or parse; anything else is returned as-is
+_NESTED_TYPES = (str, bytes, bytearray, dict, list)
+
+
 # Func for Parsing nested string:
 def normalize_tool_output(obj: Any) -> Any:
     """
@@ -86,12 +85,12 @@ def normalize_tool_output(obj: Any) -> Any:
     current = obj
     MAX_ITER = 6 # unwrap depth
     for _ in range(MAX_ITER):
-        # unwrap single-key "*_response" wrappers
-        if isinstance(current, dict) and len(current) == 1:
+        # unwrap single-key "*_response" wrappers (plain key lookups, so they don't use up the parse budget)
+        while isinstance(current, dict) and len(current) == 1:
             k = next(iter(current))
-            if isinstance(k, str) and k.endswith("_response"):
-                current = current[k]
-                continue
+            if not (isinstance(k, str) and k.endswith("_response")):
+                break
+            current = current[k]
 
         # if dict with 'result' or 'organic_results' -> take it
         if isinstance(current, dict) and "result" in current:
@@ -125,8 +124,11 @@ def normalize_tool_output(obj: Any) -> Any:
 
         # if dict (but not parsed 'result' case), attempt to normalize its values
         if isinstance(current, dict):
-            # normalize values but return dict
-            return {k: normalize_tool_output(v) for k, v in current.items()}
+            # normalize values but return dict; numbers/bools/None are final, so skip the recursive call
+            return {
+                k: normalize_tool_output(v) if isinstance(v, _NESTED_TYPES) else v
+                for k, v in current.items()
+            }
 
         # else primitive -> return
         break
@@ -197,6 +199,16 @@ def pretty_display(obj: Any, max_snippet: Optional[int] = None) -> str:
     return str(norm)
 
 
+# --- Tool Dispatcher ---
+# Tool name -> callable taking the query, bound once at import.
+# pubmed_execute maps to the raw PubMedTool; the Scholar fallback lives in agents.pubmed_execute
+# (call that instead if this client needs it).
+_TOOL_DISPATCH: Dict[str, Callable[[str], Any]] = {
+    "google_scholar_execute": google_scholar_tool.execute,
+    "pubmed_execute": pubmed_tool.execute,
+}
+
+
 def run_tool_and_get_result(name: str, args: Dict[str, Any]) -> Any:
     """
     Executes the appropriate local tool based on the name and arguments
@@ -207,25 +219,8 @@ def run_tool_and_get_result(name: str, args: Dict[str, Any]) -> Any:
         logger.warning(f"Tool {name} called without a valid query.")
         return {"error": f"Missing query for tool {name}"}
 
-
-    # --- Tool Dispatcher ---
-    if name == "google_scholar_execute":
-        # Call the execute method of the GoogleScholarTool instance
-        return google_scholar_tool.execute(query=query)
-
-    elif name == "pubmed_execute":
-        # The logic for pubmed_execute in agents.py already handles the fallback.
-        # Since your main agent is calling the *function* name, you should
-        # map to the logic that matches that function's behavior, which includes the fallback.
-        # However, for simplicity and to stay consistent with the other tool,
-        # let's assume the model is expected to handle the simple tool result first.
-
-        # FIX: Call the execute method of the PubMedTool instance
-        # NOTE: If you need the fallback, you should call the `pubmed_execute` function
-        # imported from agents.py instead of the raw tool class. Let's keep it simple
-        # and assume the execution of the raw tool is what's desired for a simple client.
-        return pubmed_tool.execute(query=query)
-
-    else:
+    fn = _TOOL_DISPATCH.get(name)
+    if fn is None:
         logger.error(f"Unknown tool requested by model: {name}")
-        return {"error": f"Unknown tool: {name}"}
\ No newline at end of file
+        return {"error": f"Unknown tool: {name}"}
+    return fn(query)
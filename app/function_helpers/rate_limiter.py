@@ -0,0 +1,41 @@
+# app/function_helpers/rate_limiter.py
+# Async token bucket: callers only wait when the per-minute request budget is actually used up.
+import time
+import asyncio
+
+
+class AsyncTokenBucket:
+    """
+    Allow up to `max_rate` acquisitions per `time_period` seconds, refilling continuously.
+    Use as `async with bucket:`; a max_rate of 0 (or less) disables limiting.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 60.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_rate, self._tokens + (now - self._last_refill) * self.max_rate / self.time_period)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        if self.max_rate <= 0:
+            return
+        # The lock keeps waiters in FIFO order; the sleep happens while holding it so nobody jumps the queue
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self) -> "AsyncTokenBucket":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        return None
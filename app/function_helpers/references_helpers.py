@@ -0,0 +1,262 @@
+# app/function_helpers/references_helpers.py
+# Reference parsing/formatting for the debate prompts.
+# Kept free of google.genai / google.adk imports so it loads without the SDK chain.
+import json
+import re
+import hashlib
+import reprlib
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple, Union
+
+try:
+    import orjson  # C-accelerated JSON parsing for reference payloads
+except ImportError:
+    orjson = None
+
+try:
+    from rank_bm25 import BM25Okapi  # relevance ranking of articles against the thesis
+except ImportError:
+    BM25Okapi = None
+
+# Prompt budget for the references block (it is sent to every debate agent and the judge)
+MAX_REFERENCE_ARTICLES = 10
+MAX_REFERENCE_DETAIL_CHARS = 200
+
+_WHITESPACE_RUN = re.compile(r"\s+")
+ERROR_SNIPPET_CHARS = 400
+
+# Memo of formatted blocks (retries and repeat runs on the same references skip parse + format)
+FORMAT_CACHE_SIZE = 128
+_format_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+
+# -----------------------
+# Helper: format references
+# -----------------------
+def loads_json(data: Union[str, bytes]) -> Any:
+    """json.loads via orjson when available (both raise ValueError subclasses on bad input)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_json_text(obj: Any) -> str:
+    """Serialize a tool payload as compact JSON text (orjson when available); non-JSON values fall back to str()."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+_PY_LITERAL = re.compile(rb"\b(True|False|None)\b")
+_JSON_LITERALS = {b"True": b"true", b"False": b"false", b"None": b"null"}
+
+
+def _json_literals_outside_strings(swapped: bytes) -> bytes:
+    """
+    Map True/False/None to true/false/null, skipping string contents. After the quote swap every
+    string is delimited by '"' with no '"' inside it, so the even-numbered split segments are exactly
+    the text between strings.
+    """
+    segments = swapped.split(b'"')
+    segments[::2] = [_PY_LITERAL.sub(lambda m: _JSON_LITERALS[m[1]], seg) for seg in segments[::2]]
+    return b'"'.join(segments)
+
+
+def parse_structured_text(cleaned: str) -> Any:
+    """
+    Parse a JSON / Python-repr string without touching the AST machinery on the common paths:
+    1) JSON as-is
+    2) Python-repr (str(dict)) with single quotes swapped for double quotes, and the
+       True/False/None literals outside strings mapped to true/false/null
+    3) ast.literal_eval as a last resort
+    Returns the cleaned text itself if nothing parses.
+    """
+    raw = cleaned.encode()
+    try:
+        return loads_json(raw)
+    except ValueError:
+        pass
+
+    # A repr only uses double quotes for strings that contain an apostrophe,
+    # so the quote swap is safe exactly when no double quote is present.
+    if b'"' not in raw:
+        swapped = raw.replace(b"'", b'"')
+        try:
+            return loads_json(swapped)
+        except ValueError:
+            pass
+        if _PY_LITERAL.search(swapped):
+            try:
+                return loads_json(_json_literals_outside_strings(swapped))
+            except ValueError:
+                pass
+
+    import ast  # only this rare path needs the AST machinery
+    try:
+        return ast.literal_eval(cleaned)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return cleaned
+
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _article_text(art: Any) -> str:
+    if not isinstance(art, dict):
+        return str(art)
+    fields = ("title", "name", "abstract", "summary", "content", "snippet")
+    return " ".join(str(art[f]) for f in fields if art.get(f))
+
+
+def _dedupe_articles(articles: list) -> list:
+    """
+    Drop articles whose title+abstract repeat an earlier one (case/punctuation-insensitive), e.g. the same
+    paper returned by both Scholar and PubMed. First occurrence wins, order is kept.
+    """
+    seen = set()
+    unique = []
+    for art in articles:
+        key = " ".join(_tokenize(_article_text(art)))
+        if key and key in seen:
+            continue
+        seen.add(key)
+        unique.append(art)
+    return unique
+
+
+def _select_articles(articles: list, query: Optional[str], max_articles: int) -> list:
+    """
+    Keep at most max_articles articles: the top BM25 matches against `query`, or the first
+    max_articles (the search tools already rank by relevance) when there is no query or rank_bm25
+    is missing from a partial install.
+    """
+    if max_articles <= 0 or len(articles) <= max_articles:
+        return articles
+    query_tokens = _tokenize(query) if query else []
+    if BM25Okapi is None or not query_tokens:
+        return articles[:max_articles]
+    # BM25Okapi divides by the average document length, so keep every document non-empty
+    corpus = [_tokenize(_article_text(art)) or ["_"] for art in articles]
+    scores = BM25Okapi(corpus).get_scores(query_tokens)
+    top = sorted(range(len(articles)), key=lambda i: scores[i], reverse=True)[:max_articles]
+    return [articles[i] for i in top]
+
+
+def _format_cache_key(references: Any, query: Optional[str], max_articles: int, max_detail_chars: int) -> Tuple:
+    """
+    Hashable key for the memo. repr() keeps key order and int keys, both of which change the output,
+    so dict/list payloads are not canonicalised beyond that.
+    """
+    if isinstance(references, (bytes, bytearray)):
+        raw = bytes(references)
+    else:
+        raw = (references if isinstance(references, str) else repr(references)).encode("utf-8", "surrogatepass")
+    digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    return (type(references).__name__, digest, query, max_articles, max_detail_chars)
+
+
+def format_references_for_context(
+    references_json_str: Any,
+    query: Optional[str] = None,
+    max_articles: int = MAX_REFERENCE_ARTICLES,
+    max_detail_chars: int = MAX_REFERENCE_DETAIL_CHARS,
+) -> str:
+    """
+    Parse the incoming references and return a formatted text block.
+    Preferred input: the already-parsed list/dict; raw JSON bytes (e.g. an HTTP body) are decoded
+    directly; any other value goes through the JSON / repr / literal parse chain as text.
+    Only the max_articles most relevant to `query` (the thesis) are kept, with details cut to
+    max_detail_chars; pass max_articles=0 to keep them all. Results are memoized (LRU) per input.
+    """
+    key = _format_cache_key(references_json_str, query, max_articles, max_detail_chars)
+    cached = _format_cache.get(key)
+    if cached is not None:
+        _format_cache.move_to_end(key)
+        return cached
+
+    formatted = _format_references(references_json_str, query, max_articles, max_detail_chars)
+    _format_cache[key] = formatted
+    if len(_format_cache) > FORMAT_CACHE_SIZE:
+        _format_cache.popitem(last=False)
+    return formatted
+
+
+def _format_references(references_json_str: Any, query: Optional[str], max_articles: int, max_detail_chars: int) -> str:
+    """Uncached body of format_references_for_context."""
+    try:
+        if not references_json_str:
+            return "No references provided."
+
+        if isinstance(references_json_str, (list, dict)):
+            articles = references_json_str
+        elif isinstance(references_json_str, (bytes, bytearray)):
+            # Straight to the JSON decoder; str(bytes) would produce "b'...'" and never parse
+            try:
+                articles = loads_json(bytes(references_json_str))
+            except ValueError:
+                cleaned = bytes(references_json_str).decode("utf-8", "replace").strip()
+                articles = parse_structured_text(cleaned)
+                if isinstance(articles, str):
+                    return f"### AVAILABLE REFERENCES / CONTEXT ###\nRaw text:\n{cleaned}\n"
+        else:
+            cleaned = str(references_json_str).strip()
+            articles = parse_structured_text(cleaned)
+            if isinstance(articles, str):
+                return f"### AVAILABLE REFERENCES / CONTEXT ###\nRaw text:\n{cleaned}\n"
+
+        # Uniform processing
+        if isinstance(articles, dict):
+            # Tool output shape: {'result': [...]} (or SerpApi's 'organic_results')
+            articles = articles.get("result", articles.get("organic_results", articles))
+        if isinstance(articles, dict):
+            # {0: {...}, 1: {...}} (e.g. a literal_eval'd index map) -> its values; any other dict is one article.
+            # Sniff the first key only; insertion order is kept, as everywhere else in this pipeline.
+            if isinstance(next(iter(articles), None), int):
+                articles = list(articles.values())
+            else:
+                articles = [articles]
+
+        # If it failed to become a list by now (e.g. just a string), return text
+        if not isinstance(articles, list):
+            return f"### AVAILABLE REFERENCES / CONTEXT ###\nRaw text:\n{str(articles)}\n"
+
+        articles = _select_articles(_dedupe_articles(articles), query, max_articles)
+        parts = ["### AVAILABLE REFERENCES / CONTEXT ###\n\n"]
+
+        for idx, art in enumerate(articles, 1):
+            if not isinstance(art, dict):
+                parts.append(f"Reference {idx}: {str(art)[:500]}\n\n")
+                continue
+
+            title = art.get("title") or art.get("name") or "Unknown Title"
+            content = art.get("abstract") or art.get("summary") or art.get("content") or art.get("snippet")
+            source = art.get("source") or art.get("journal") or art.get("publisher")
+            authors = art.get("authors") or art.get("AU")
+            link = art.get("link") or art.get("url") or "No link"
+
+            parts.append(f"Article {idx}: '{title}'\n")
+            if authors:
+                parts.append(f"   Authors: {authors}\n")
+            if source:
+                parts.append(f"   Source:  {source}\n")
+            if content:
+                snippet = _WHITESPACE_RUN.sub(" ", str(content)).strip()[:max_detail_chars]
+                parts.append(f"   Details: {snippet}...\n")
+            parts.append(f"   Link:    {link}\n\n")
+
+        return "".join(parts)
+
+    except Exception as e:
+        return f"Error formatting references: {e}\nRaw input (truncated): {_raw_input_snippet(references_json_str)}"
+
+
+def _raw_input_snippet(raw: Any, limit: int = ERROR_SNIPPET_CHARS) -> str:
+    """
+    Short preview of the input for error messages, without materializing the whole thing first:
+    text/bytes are sliced before any conversion, containers go through reprlib (bounded per level).
+    """
+    if isinstance(raw, str):
+        return raw[:limit]
+    if isinstance(raw, (bytes, bytearray)):
+        return bytes(raw[:limit]).decode("utf-8", "replace")
+    return reprlib.repr(raw)[:limit]
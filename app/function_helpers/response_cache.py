@@ -0,0 +1,65 @@
+# app/function_helpers/response_cache.py
+# Opt-in on-disk cache for debate/judge outputs, keyed by SHA-256 of the full model request.
+import os
+import json
+import hashlib
+import tempfile
+from typing import Any, Optional
+from app.config.settings import logger, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_DIR, RESPONSE_CACHE_REFRESH
+
+
+def _jsonable(obj: Any) -> Any:
+    """genai Content/config objects -> plain JSON data (pydantic model_dump), recursing into lists."""
+    dump = getattr(obj, "model_dump", None)
+    if dump is not None:
+        return dump(mode="json", exclude_none=True)
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(o) for o in obj]
+    return obj
+
+
+def make_key(model_name: str, *request_parts: Any) -> str:
+    """Deterministic SHA-256 over the model name and everything that shapes the request."""
+    payload = json.dumps([model_name, *(_jsonable(p) for p in request_parts)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_text(key: str) -> Optional[str]:
+    """Return the cached text for key, or None on a miss (or when caching is disabled / force-refreshing)."""
+    if not RESPONSE_CACHE_ENABLED or RESPONSE_CACHE_REFRESH:
+        return None
+    path = os.path.join(RESPONSE_CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["text"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug("[response_cache] ignoring unreadable cache entry %s: %s", path, e)
+        return None
+
+
+def put_text(key: str, text: str) -> None:
+    """
+    Store text under key (atomic replace, so a crashed write never leaves a half entry).
+    The temp file name is unique, so concurrent writers of the same key never share one.
+    """
+    if not RESPONSE_CACHE_ENABLED or not text:
+        return
+    path = os.path.join(RESPONSE_CACHE_DIR, f"{key}.json")
+    tmp_path = None
+    try:
+        os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=RESPONSE_CACHE_DIR, prefix=f"{key}.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            json.dump({"text": text}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug("[response_cache] could not write %s: %s", path, e)
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,34 @@
+# app/function_helpers/search_helpers.py
+# Combined Scholar + PubMed search; kept free of google.adk imports so any caller can use it cheaply.
+import asyncio
+from typing import Any, Dict, List
+from app.config.settings import logger
+
+
+def merge_search_responses(responses: List[Any]) -> Dict[str, Any]:
+    """
+    Merge [scholar_response, pubmed_response] (dicts or raised exceptions) into one {'result': [...]}.
+    Returns {'error': ...} only when neither source produced results.
+    """
+    merged, errors = [], []
+    for source, resp in zip(("Google Scholar", "PubMed"), responses):
+        if isinstance(resp, dict) and isinstance(resp.get("result"), list):
+            merged.extend(resp["result"])
+        else:
+            err = resp.get("error") if isinstance(resp, dict) else resp
+            logger.info("[merge_search_responses] %s returned no results: %s", source, err)
+            errors.append(f"{source}: {err}")
+    if not merged and errors:
+        return {"error": "; ".join(errors)}
+    return {"result": merged}
+
+
+async def parallel_search(scholar_tool: Any, pubmed_tool: Any, query: str) -> Dict[str, Any]:
+    """Run both tools' execute(query) at the same time and merge the results (same shape as a single tool)."""
+    # Both clients block on HTTP, so each runs in its own thread and the two requests overlap
+    responses = await asyncio.gather(
+        asyncio.to_thread(scholar_tool.execute, query),
+        asyncio.to_thread(pubmed_tool.execute, query),
+        return_exceptions=True,
+    )
+    return merge_search_responses(responses)
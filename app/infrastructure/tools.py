@@ -1,6 +1,8 @@
 # ThesisAdvisorAgent/app/infrastructure/tools.py
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Any, Dict
 from Bio import Entrez, Medline  # pip install biopython
 from app.config.settings import logger, EMAIL
@@ -11,6 +13,15 @@ api_key = os.getenv("NCBI_API_KEY")
 if api_key:
     Entrez.api_key = api_key
 
+# One keep-alive connection pool for the HTTP tools, shared by every tool instance and thread
+# (parallel searches, both debaters): repeat SerpApi queries skip the TCP + TLS handshake.
+# Transient statuses are retried with short back-off (the Gemini RETRY_CONFIG codes plus 502).
+HTTP_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=HTTP_RETRY))
+# (connect, read) seconds: fail fast on an unreachable host instead of hanging a debate round
+HTTP_TIMEOUT = (3.05, 20)
+
 
 class GoogleScholarTool:
     """Google Scholar search using SerpApi. Returns formatted string for LLM consumption."""
@@ -27,7 +38,7 @@ class GoogleScholarTool:
 
         try:
             params = {"engine": "google_scholar", "q": query, "api_key": api_key, "num": 5}
-            response = requests.get("https://serpapi.com/search.json", params=params)
+            response = HTTP_SESSION.get("https://serpapi.com/search.json", params=params, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
             data = response.json()
 
@@ -148,8 +148,7 @@ async def main():
                 references_json=references_for_debate,
                 runner=runner,  # Pass the local runner for criteria dialogue
                 user_id=USER_ID,
-                session_id=SESSION_ID,
-                blocking_mode="to_thread"  # Ensures the debate agents run without blocking
+                session_id=SESSION_ID
             )
             break  # Debate completed
         elif choice == 'r':
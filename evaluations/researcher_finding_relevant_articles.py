@@ -7,6 +7,7 @@ import ast
 import asyncio
 import logging
 import re
+import functools
 from difflib import SequenceMatcher
 from types import SimpleNamespace
 from typing import Any, List, Tuple, Optional, Dict
@@ -276,19 +277,26 @@ async def run_agent_query(talk_agent, query: str, user_id: str, session_id: str,
 # -------------------------
 # Gemini similarity evaluator (1..10). fallback -> fuzzy scale
 # -------------------------
-def gemini_similarity_score_sync(target: str, candidate_text: str, api_key: Optional[str]) -> float:
+@functools.lru_cache(maxsize=4)
+def _get_scoring_model(model_name: str, api_key: Optional[str]) -> Gemini:
+    """One Gemini wrapper (and so one client / connection pool) per model + key, reused by every score."""
+    return Gemini(model=model_name, api_key=api_key)
+
+
+async def gemini_similarity_score(target: str, candidate_text: str, api_key: Optional[str]) -> float:
     """
-    Synchronously call Gemini generate_content to request rating 1..10.
+    Call Gemini generate_content on the native async client (no blocking inside evaluate_all's loop)
+    to request rating 1..10.
     Returns float 1..10. On failure returns fuzzy ratio*10.
     """
     try:
-        model = Gemini(model="gemini-2.5-flash", api_key=api_key)
+        model = _get_scoring_model("gemini-2.5-flash", api_key)
         prompt = (
             "Rate how closely the candidate search result matches the target article title on a scale 1..10.\n\n"
             f"Target title:\n{target}\n\nCandidate (title/snippet):\n{candidate_text}\n\n"
             "Output only a single number between 1 and 10 (inclusive). If you think it's an exact match, return 10."
         )
-        resp = model.api_client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
+        resp = await model.api_client.aio.models.generate_content(model="gemini-2.5-flash", contents=prompt)
         text = getattr(resp, "text", None) or str(resp)
         # extract first integer 1..10
         m = re.search(r"\b([1-9]|10)\b", text)
@@ -400,12 +408,12 @@ async def evaluate_all():
         # use gemini to score similarity (target vs best_title or raw_response)
         if target_title:
             candidate_for_score = best_title or (str(raw_response)[:800])
-            sim_score = gemini_similarity_score_sync(target_title, candidate_for_score, api_key=key)
+            sim_score = await gemini_similarity_score(target_title, candidate_for_score, api_key=key)
         else:
             # for general searches we'll ask Gemini to score how relevant these results are to "sport and health"
             # We'll supply the query and the top text and let Gemini return 1..10
             candidate_for_score = str(raw_response)[:800] if raw_response else text[:800]
-            sim_score = gemini_similarity_score_sync(query, candidate_for_score, api_key=key)
+            sim_score = await gemini_similarity_score(query, candidate_for_score, api_key=key)
 
         # Print results compactly
         print(f"Tool USED by agent: {tool_used}")
@@ -200,8 +200,7 @@ async def main():
                 references_json=references_obj,
                 runner=runner,
                 user_id=user_id,
-                session_id=session_id,
-                blocking_mode="to_thread"
+                session_id=session_id
             )
             break
         elif choice == 'r':